@@ -3,12 +3,21 @@ import numpy as np
 import cv2
 import csv
 import time
+import threading
 import winsound  # （仅 Windows）
+from analysis import DISTANCE_THRESHOLDS, LOW_PERCENTILE, ROIS, BandAnalyzer
+from render import LEGEND_LABELS, FrameSlot, Renderer, TileOverlay
 
 # 常量定义
-DISTANCE_THRESHOLDS = [0.3, 0.5, 1.0, 2.0]  #（米）
+DEPTH_SIZE = (640, 480)  # 深度分辨率，远距离可用 (848, 480)
+COLOR_SIZE = (640, 480)  # RGB 分辨率，可用 (1280, 720)
 ALERT_FREQUENCIES = [100, 1500, 2500, 5000]  # 频率（毫秒）
+ALERT_MIN_AREAS = [1e-4, 2e-4, 4e-4, 8e-4]  # 触发各级报警所需的最小面积（占整帧像素的比例），过滤单点噪声
+SUMMARY_INTERVAL = 1.0  # 区域统计写入日志的间隔（秒）
+DISPLAY_FPS = 30  # 显示刷新上限，与分析帧率无关
+CLICK_LABEL_SECONDS = 3  # 点击标注的显示时长（秒）
 csv_file = "distance_data.csv"  # CSV 文件名
+summary_file = "zone_summary.csv"  # 区域统计日志
 click_data = []  # 存储点击数据
 click_time = None  # 存储点击时间
 
@@ -16,10 +25,11 @@ click_time = None  # 存储点击时间
 def initialize_camera():
     pipeline = rs.pipeline()
     config = rs.config()
-    config.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)  # 深度
-    config.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)  # RGB
-    pipeline.start(config)
-    return pipeline, rs.align(rs.stream.color)
+    config.enable_stream(rs.stream.depth, *DEPTH_SIZE, rs.format.z16, 30)  # 深度
+    config.enable_stream(rs.stream.color, *COLOR_SIZE, rs.format.bgr8, 30)  # RGB
+    profile = pipeline.start(config)
+    depth_scale = profile.get_device().first_depth_sensor().get_depth_scale()  # 深度单位（米）
+    return pipeline, rs.align(rs.stream.color), depth_scale
 
 # 获取深度和RGB帧
 def get_frames(pipeline, align):
@@ -27,13 +37,14 @@ def get_frames(pipeline, align):
     aligned_frames = align.process(frames)
     return aligned_frames.get_depth_frame(), aligned_frames.get_color_frame()
 
-# 检查最近距离并触发报警
-def check_alerts(closest_distance, last_alert_time):
+# 根据区域统计触发报警：比阈值更近的面积达到 ALERT_MIN_AREAS 才报警
+def check_alerts(summary, last_alert_time):
+    near_area = np.cumsum(summary.zone_counts) / summary.total_pixels  # 比各阈值更近的面积比例
     for i, threshold in enumerate(DISTANCE_THRESHOLDS):
-        if closest_distance < threshold:
+        if near_area[i] >= ALERT_MIN_AREAS[i]:
             current_time = time.time() * 1000  # 当前时间
             if current_time - last_alert_time > ALERT_FREQUENCIES[i]:
-                print(f"警报：目标物体太近！最近距离为：{round(closest_distance, 2)} 米")
+                print(f"警报：目标物体太近！{threshold} 米以内的面积占 {near_area[i] * 100:.2f}%")
                 winsound.Beep(3000, 200)  # 播放报警声音 （频率，时间）
                 return current_time  # 更新最后报警时间
     return last_alert_time
@@ -42,102 +53,112 @@ def mouse_callback(event, x, y, flags, param):
     if event == cv2.EVENT_LBUTTONDOWN:
         param.append((x, y, time.time()))  # 记录点击时间
 
-def draw_legend(image):
-    legend_x = 20
-    legend_y = 20
-    legend_width = 140
-    legend_height = 130
-    cv2.rectangle(image, (legend_x, legend_y), (legend_x + legend_width, legend_y + legend_height), (255, 255, 255), -1)
-    cv2.putText(image, "Legend", (legend_x + 10, legend_y + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1, cv2.LINE_AA)
-
-    colors = [(0, 0, 255), (0, 165, 255), (0, 255, 255), (0, 255, 0)]
-    labels = ["<0.3m", "0.3-0.5m", "0.5-1.0m", "1.0-2.0m"]
-    
-    for i, color in enumerate(colors):
-        cv2.rectangle(image, (legend_x + 10, legend_y + 40 + i * 20), (legend_x + 30, legend_y + 60 + i * 20), color, -1)
-        cv2.putText(image, labels[i], (legend_x + 40, legend_y + 55 + i * 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1, cv2.LINE_AA)
-
-def main():
-    pipeline, align = initialize_camera()
+# 区域统计日志表头：各列为对应距离区间内的像素数（不累计），与图例标签一致
+def summary_header():
+    header = ["Time", "Min (m)", f"P{LOW_PERCENTILE:g} (m)", "Valid"]
+    header += LEGEND_LABELS
+    header += [f"{name} {label}" for name, _ in ROIS for label in LEGEND_LABELS]
+    return header
+
+# 写入一行区域统计
+def write_summary(writer, summary):
+    row = [round(time.time(), 3), summary.closest, summary.low_percentile, summary.valid_pixels]
+    row += summary.zone_counts.tolist()
+    row += summary.roi_zone_counts.ravel().tolist()
+    writer.writerow(row)
+
+# 分析线程：取帧、分析、报警和记录区域统计，结果交给显示循环
+def analysis_loop(pipeline, align, depth_scale, slot, stop_event):
+    analyzer = None  # 首帧到达后按对齐后的分辨率创建
     last_alert_time = 0
+    last_summary_time = 0
 
-    cv2.namedWindow('Camera')  # 创建窗口
-
-    # 写入CSV文件
-    with open(csv_file, mode="w", newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(["X", "Y", "Distance (m)"])  
+    with open(summary_file, mode="w", newline='') as log_file:
+        summary_writer = csv.writer(log_file)
+        summary_writer.writerow(summary_header())
 
         try:
-            while True:
+            while not stop_event.is_set():
                 depth_frame, color_frame = get_frames(pipeline, align)
                 if not depth_frame or not color_frame:
                     continue
 
                 depth_image = np.asanyarray(depth_frame.get_data())
                 color_image = np.asanyarray(color_frame.get_data())
-                depth_colormap = cv2.applyColorMap(cv2.convertScaleAbs(depth_image, alpha=0.03), cv2.COLORMAP_JET)
+                if analyzer is None:
+                    height, width = color_image.shape[:2]
+                    analyzer = BandAnalyzer(width, height, depth_scale, overlay=TileOverlay(width, height))
 
-                combined_image = cv2.addWeighted(color_image, 0.5, depth_colormap, 0.5, 0)
+                # 分条带并行：区域分类、区域统计、覆盖层更新与图像合成；
+                # 显示循环还没取走上一帧时，这一帧不会被显示，只做分类和统计
+                compose = slot.consumed()
+                combined_image, summary = analyzer.process(depth_image, color_image, compose)
 
-                # 创建透明覆盖层
-                overlay = np.zeros_like(color_image)
+                # 检查报警
+                last_alert_time = check_alerts(summary, last_alert_time)
 
-                # 获取深度值并计算最近距离
-                distances = np.array([depth_frame.get_distance(x, y) for y in range(depth_frame.get_height()) for x in range(depth_frame.get_width())]).reshape((480, 640))
-                closest_distance = np.min(distances[distances > 0]) if np.any(distances > 0) else float('inf')
+                # 定期记录区域统计
+                if time.time() - last_summary_time >= SUMMARY_INTERVAL:
+                    write_summary(summary_writer, summary)
+                    last_summary_time = time.time()
 
-                # 检查报警
-                last_alert_time = check_alerts(closest_distance, last_alert_time)
-
-                # 标记不同深度区域
-                for y in range(depth_frame.get_height()):
-                    for x in range(depth_frame.get_width()):
-                        distance = distances[y, x]
-                        color = (0, 0, 0)
-                        if 0 < distance < DISTANCE_THRESHOLDS[0]:
-                            color = (0, 0, 255)  # 红色，最近
-                        elif DISTANCE_THRESHOLDS[0] <= distance < DISTANCE_THRESHOLDS[1]:
-                            color = (0, 165, 255)  # 橙色，近距离
-                        elif DISTANCE_THRESHOLDS[1] <= distance < DISTANCE_THRESHOLDS[2]:
-                            color = (0, 255, 255)  # 黄色，中等距离
-                        elif DISTANCE_THRESHOLDS[2] <= distance < DISTANCE_THRESHOLDS[3]:
-                            color = (0, 255, 0)  # 绿色，较远
-                        
-                        cv2.circle(overlay, (x, y), 1, color, -1)
-
-                # 合成覆盖层与原始图像
-                combined_image = cv2.addWeighted(combined_image, 1.0, overlay, 0.3, 0)
-                cv2.putText(combined_image, "Click to view location distance.                          Press [Q] to exit.", (20, combined_image.shape[0] - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
-                draw_legend(combined_image)
-
-                # 显示合成图像
-                if click_data:
-                    current_time = time.time()
-                    for (x, y, click_time) in click_data:
-                        # 检查点击是否在3秒内
-                        if current_time - click_time <= 3:
-                            distance = depth_frame.get_distance(x, y)
-                            cv2.putText(combined_image, f"{distance:.2f} m", (x + 10, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
-
-                cv2.imshow('Camera', combined_image)
-
-                # 鼠标回调
-                cv2.setMouseCallback('Camera', mouse_callback, click_data)
-
-                # 写入数据到 CSV 文件
-                if click_data:
-                    for x, y, _ in click_data:
-                        distance = depth_frame.get_distance(x, y)
+                if compose:
+                    slot.publish(combined_image, depth_image, summary)
+
+        finally:
+            if analyzer is not None:
+                analyzer.close()
+
+def main():
+    pipeline, align, depth_scale = initialize_camera()
+    slot = FrameSlot()
+    stop_event = threading.Event()
+    analysis_thread = threading.Thread(target=analysis_loop, args=(pipeline, align, depth_scale, slot, stop_event), daemon=True)
+    renderer = None  # 首帧到达后按分辨率创建
+    shown_seq = 0  # 已显示的分析帧序号
+    summary = None
+
+    cv2.namedWindow('Camera')  # 创建窗口
+    cv2.setMouseCallback('Camera', mouse_callback, click_data)  # 鼠标回调
+
+    # 写入CSV文件
+    with open(csv_file, mode="w", newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["X", "Y", "Distance (m)"])  
+
+        analysis_thread.start()
+        try:
+            # 显示循环：按 DISPLAY_FPS 刷新，与分析帧率无关
+            while analysis_thread.is_alive():
+                frame_start = time.time()
+
+                if slot.seq:
+                    if renderer is None:
+                        renderer = Renderer(slot.image.shape[1], slot.image.shape[0])
+
+                    # 处理点击：输出距离、写入 CSV，并添加定时显示的标注
+                    for x, y, click_time in click_data:
+                        distance = slot.depth_at(x, y) * depth_scale  # 原始深度单位，仅在输出时换算为米
                         print(f"({x}, {y}) 处的距离: {distance:.2f} 米")
                         writer.writerow([x, y, distance])
+                        renderer.add_label(x + 10, y - 10, f"{distance:.2f} m", click_time + CLICK_LABEL_SECONDS)
                     click_data.clear()  # 清空已处理的数据
 
+                    # 有新的分析结果时只在复制期间持锁；合成界面和显示都在锁外进行
+                    new_frame = slot.seq != shown_seq
+                    if new_frame:
+                        shown_seq, summary = slot.read(renderer.image)
+                    if new_frame or renderer.needs_redraw(frame_start):
+                        cv2.imshow('Camera', renderer.render(summary, frame_start))
+
                 # 按 'q' 键退出
-                if cv2.waitKey(1) & 0xFF == ord('q'):
+                delay = max(1, int((1 / DISPLAY_FPS - (time.time() - frame_start)) * 1000))
+                if cv2.waitKey(delay) & 0xFF == ord('q'):
                     break
 
         finally:
+            stop_event.set()
+            analysis_thread.join()
             pipeline.stop()
             cv2.destroyAllWindows()
             print(f"程序结束，距离数据已保存到 {csv_file} 文件中。")
@@ -0,0 +1,222 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import cv2
+
+# 常量定义
+DISTANCE_THRESHOLDS = [0.3, 0.5, 1.0, 2.0]  #（米）
+ZONE_COLORS = [(0, 0, 255), (0, 165, 255), (0, 255, 255), (0, 255, 0)]  # 红、橙、黄、绿
+NO_ZONE = len(DISTANCE_THRESHOLDS)  # 超出最远阈值或无效深度
+ZONE_LUT = np.array(ZONE_COLORS + [(0, 0, 0)], dtype=np.uint8)  # 区域编号 -> 覆盖层颜色
+PARALLEL_MIN_PIXELS = 640 * 480  # 小于该像素数的帧直接单线程处理
+
+# 感兴趣区域（按画面比例 x0, y0, x1, y1）：车后左、中、右
+ROIS = [
+    ("left", (0.0, 0.0, 1 / 3, 1.0)),
+    ("center", (1 / 3, 0.0, 2 / 3, 1.0)),
+    ("right", (2 / 3, 0.0, 1.0, 1.0)),
+]
+LOW_PERCENTILE = 1.0  # 稳健最近距离所用的低百分位（%）
+
+# 距离直方图：0 ~ 最远阈值再多一格按 1 厘米分格（多出的一格供回差判断），
+# 最后两格为“超出范围”和“无效深度”
+HIST_BIN_SIZE = 0.01  #（米）
+ZONE_EDGES = [int(round(t / HIST_BIN_SIZE)) for t in DISTANCE_THRESHOLDS]  # 各阈值所在的格
+BEYOND_BIN = ZONE_EDGES[-1] + 1
+INVALID_BIN = BEYOND_BIN + 1
+N_HIST_BINS = INVALID_BIN + 1
+BIN_ZONES = np.searchsorted(ZONE_EDGES, np.arange(N_HIST_BINS), side='right').astype(np.uint8)
+BIN_ZONES[INVALID_BIN] = NO_ZONE
+RAW_EPSILON = 1e-6  # 阈值换算为原始单位时吸收浮点误差（原始单位）
+
+
+# 显示用区域编号的回差表，按 [上一帧区域编号, 本帧直方图格] 查表：
+# 深度离开原区域不足 1 格（1 厘米）时保持原区域，避免传感器抖动使覆盖层在阈值附近反复变化
+def zone_hysteresis_table():
+    table = np.empty((NO_ZONE + 1, N_HIST_BINS), dtype=np.uint8)
+    for prev in range(NO_ZONE + 1):
+        for b in range(N_HIST_BINS):
+            table[prev, b] = BIN_ZONES[b]
+            if b < BEYOND_BIN and BIN_ZONES[max(b - 1, 0)] <= prev <= BIN_ZONES[b + 1]:
+                table[prev, b] = prev
+    return table.ravel()
+
+
+ZONE_HYSTERESIS = zone_hysteresis_table()
+
+# 每帧的区域统计摘要，报警、界面显示和日志都只读取它
+ZoneSummary = namedtuple("ZoneSummary", [
+    "zone_counts",      # 各距离区间的像素数
+    "roi_zone_counts",  # 每个 ROI 各距离区间的像素数，形状 (len(ROIS), NO_ZONE)
+    "closest",          # 最近距离（米）
+    "low_percentile",   # LOW_PERCENTILE 百分位距离（米），按直方图分格精度
+    "valid_pixels",     # 有效深度像素数
+    "total_pixels",     # 整帧像素数
+])
+
+
+# 把图像高度切分为若干水平条带
+def split_bands(height, n_bands):
+    n_bands = max(1, min(n_bands, height))
+    edges = np.linspace(0, height, n_bands + 1).astype(int)
+    return [(int(edges[i]), int(edges[i + 1])) for i in range(n_bands)]
+
+
+class BandAnalyzer:
+    """按水平条带并行完成区域分类、区域统计和底图合成。
+
+    线程池在整个运行期间复用，结果直接写入共享的输出缓冲区；
+    NumPy / OpenCV 的计算会释放 GIL，因此多个条带可以真正并行。
+    每个像素只分类一次（映射到距离直方图的格），ROI 直方图由这一结果在整帧上一次计数得到，
+    显示用的区域编号由它和上一帧的区域编号查回差表得到。传入 overlay（render.TileOverlay）
+    时，各条带还会更新自己行内的覆盖层并合成到输出图像上；compose=False 的帧（不会被显示）
+    跳过图像合成和覆盖层更新，只做分类和统计。
+
+    默认直接在 z16 原始深度（uint16）上处理：各阈值按设备的 depth_scale 换算一次为
+    原始单位 ceil(t / depth_scale)，与原来 distance < t 的严格比较一致，直方图格边界也随之换算。格宽恰为整数个原始单位时
+    用原地整数除法分类，否则用由这些边界生成的 65536 项查找表；整帧不产生浮点数组，
+    只有最近距离、低百分位等少量显示值才换算为米。
+    integer=False 为先换算成米再分类的浮点路径，用于对比测试。
+    """
+
+    def __init__(self, width, height, depth_scale, workers=None, integer=True, overlay=None):
+        self.width = width
+        self.height = height
+        self.depth_scale = float(depth_scale)
+        self.integer = integer
+        self.overlay = overlay
+        self.workers = workers or os.cpu_count() or 1
+
+        # 小帧或单核时退回单线程，避免线程调度开销大于计算本身
+        parallel = self.workers > 1 and width * height >= PARALLEL_MIN_PIXELS
+        self.bands = split_bands(height, self.workers if parallel else 1)
+        self.pool = ThreadPoolExecutor(max_workers=len(self.bands)) if parallel else None
+
+        # ROI 标签图（不在任何 ROI 内的像素标为 len(ROIS)），预先乘以格数作为直方图偏移
+        self.n_keys = (len(ROIS) + 1) * N_HIST_BINS
+        roi_map = np.full((height, width), len(ROIS), dtype=np.uint16)
+        for i, (_, (x0, y0, x1, y1)) in enumerate(ROIS):
+            roi_map[int(y0 * height):int(y1 * height), int(x0 * width):int(x1 * width)] = i
+        self.roi_offsets = roi_map * np.uint16(N_HIST_BINS)
+
+        # 直方图格边界换算为原始单位：raw * depth_scale < t 等价于 raw < ceil(t / depth_scale)，
+        # 减去 RAW_EPSILON 以免比值恰为整数时浮点误差使 ceil 多进一位
+        raw_edges = np.ceil(np.arange(BEYOND_BIN + 1) * HIST_BIN_SIZE / self.depth_scale - RAW_EPSILON)
+        raw_edges[ZONE_EDGES] = np.ceil(np.array(DISTANCE_THRESHOLDS) / self.depth_scale - RAW_EPSILON)
+        # 格宽恰为整数个原始单位时可直接整除，否则使用查找表
+        self.bin_raw = int(raw_edges[1])
+        if self.bin_raw < 1 or np.any(raw_edges != np.arange(BEYOND_BIN + 1) * self.bin_raw):
+            self.bin_raw = None
+            raw_bins = np.searchsorted(raw_edges, np.arange(65536), side='right') - 1
+            self.raw_bins = np.minimum(raw_bins, BEYOND_BIN).astype(np.uint16)
+            self.raw_bins[0] = INVALID_BIN
+        # 浮点路径使用的常量
+        self.depth_scale_f32 = np.float32(self.depth_scale)
+        self.inv_bin_size = np.float32(1 / HIST_BIN_SIZE)
+
+        # 共享输出缓冲区，每个条带只写自己的行
+        self.zones = np.full((height, width), NO_ZONE, dtype=np.uint8)  # 跨帧保留，用于回差
+        self.combined = np.empty((height, width, 3), dtype=np.uint8)
+        self.bins = np.empty((height, width), dtype=np.uint16)
+        self.keys = np.empty((height, width), dtype=np.uint16)
+        self.scratch = np.empty((height, width), dtype=np.uint16)
+        self.invalid = np.empty((height, width), dtype=bool)
+        self.band_mins = np.full(len(self.bands), np.inf)  #（米）
+        self.hist = np.zeros(self.n_keys, dtype=np.int64)
+
+    # 处理单个条带
+    def _analyze_band(self, index, depth_image, color_image, compose):
+        y0, y1 = self.bands[index]
+        raw = depth_image[y0:y1]
+
+        # 一次分类：原始深度 -> 直方图格（超出最远阈值和无效深度各占一格），同时求条带内最近距离
+        bins = self.bins[y0:y1]
+        if self.integer:
+            if self.bin_raw is None:
+                np.take(self.raw_bins, raw, out=bins)
+            else:
+                invalid = self.invalid[y0:y1]
+                np.floor_divide(raw, self.bin_raw, out=bins)
+                np.minimum(bins, BEYOND_BIN, out=bins)
+                np.equal(raw, 0, out=invalid)
+                np.copyto(bins, INVALID_BIN, where=invalid)
+            # 无效深度 0 减一后回绕为最大值，不影响求最小值；只把结果换算为米
+            scratch = self.scratch[y0:y1]
+            np.subtract(raw, 1, out=scratch)
+            closest = int(scratch.min())
+            self.band_mins[index] = (closest + 1) * self.depth_scale if closest != 0xFFFF else np.inf
+        else:
+            distances = raw * self.depth_scale_f32  # 整帧换算为米
+            valid = distances > 0
+            scaled = distances * self.inv_bin_size
+            np.minimum(scaled, BEYOND_BIN, out=scaled)
+            bins[...] = scaled
+            bins[~valid] = INVALID_BIN
+            self.band_mins[index] = distances[valid].min() if valid.any() else np.inf
+
+        # 显示用区域编号：由上一帧的区域编号和本帧的格查回差表
+        zones = self.zones[y0:y1]
+        index_buffer = self.scratch[y0:y1]
+        np.multiply(zones, N_HIST_BINS, out=index_buffer, dtype=np.uint16)
+        np.add(index_buffer, bins, out=index_buffer)
+        np.take(ZONE_HYSTERESIS, index_buffer, out=zones)
+
+        # 直方图键 (ROI, 格)，整帧在 summarize 中一次计数
+        keys = self.keys[y0:y1]
+        np.add(bins, self.roi_offsets[y0:y1], out=keys)
+
+        if not compose:
+            return
+
+        # 彩色图与深度伪彩色图合成，再叠加覆盖层（只重绘区域变化的图块）
+        depth_colormap = cv2.applyColorMap(cv2.convertScaleAbs(raw, alpha=0.03), cv2.COLORMAP_JET)
+        combined = self.combined[y0:y1]
+        cv2.addWeighted(color_image[y0:y1], 0.5, depth_colormap, 0.5, 0, dst=combined)
+        if self.overlay is not None:
+            self.overlay.update(y0, y1, self.zones)
+            cv2.addWeighted(combined, 1.0, self.overlay.overlay[y0:y1], 0.3, 0, dst=combined)
+
+    # 处理一帧，返回合成图像和区域统计摘要；compose=False 时合成图像保持上一次的内容
+    def process(self, depth_image, color_image, compose=True):
+        if self.pool is None:
+            self._analyze_band(0, depth_image, color_image, compose)
+        else:
+            futures = [self.pool.submit(self._analyze_band, i, depth_image, color_image, compose)
+                       for i in range(len(self.bands))]
+            for future in futures:
+                future.result()  # 传递条带中的异常
+        return self.combined, self.summarize()
+
+    # 对整帧的直方图键计数一次，生成本帧的区域统计摘要
+    def summarize(self):
+        # np.bincount 没有 out 参数，每帧仍会产生一个 n_keys 长的小数组，随即复制进复用的 hist
+        self.hist[...] = np.bincount(self.keys.ravel(), minlength=self.n_keys)
+        hist = self.hist.reshape(len(ROIS) + 1, N_HIST_BINS)
+        roi_zone_counts = np.add.reduceat(hist[:, :ZONE_EDGES[-1]], [0] + ZONE_EDGES[:-1], axis=1)
+        distance_hist = hist[:, :ZONE_EDGES[-1]].sum(axis=0)
+        total_pixels = int(self.hist.sum())
+        valid_pixels = total_pixels - int(hist[:, INVALID_BIN].sum())
+
+        # 低百分位：在累计直方图中查找，落在最远阈值之外时记为无穷远
+        low_percentile = np.inf
+        if valid_pixels:
+            target = max(1.0, valid_pixels * LOW_PERCENTILE / 100)
+            index = int(np.searchsorted(np.cumsum(distance_hist), target))
+            if index < ZONE_EDGES[-1]:
+                low_percentile = (index + 0.5) * HIST_BIN_SIZE
+
+        return ZoneSummary(
+            zone_counts=roi_zone_counts.sum(axis=0),
+            roi_zone_counts=roi_zone_counts[:len(ROIS)],
+            closest=float(self.band_mins.min()),
+            low_percentile=low_percentile,
+            valid_pixels=valid_pixels,
+            total_pixels=total_pixels,
+        )
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
@@ -0,0 +1,137 @@
+import os
+import time
+import tracemalloc
+import numpy as np
+from analysis import BandAnalyzer
+from render import TILE_SIZE, TileOverlay
+
+# 条带并行分析的扩展性测试、整数/浮点路径对比和显示合成的 CPU 占用对比（无需相机，使用合成帧）
+FRAME_SIZES = [(640, 480), (848, 480), (1280, 720)]
+DEPTH_SCALE = 0.001  # D435i 默认深度单位（米）
+REPEATS = 50
+STATIC_NOISE = 3  # 静止倒车场景中深度的逐帧抖动（原始单位）
+
+# 生成合成的深度帧和RGB帧：由近到远的渐变加噪声，并带少量无效像素
+def make_frames(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(200, 3000, height, dtype=np.float32)[:, None]
+    depth = ramp + rng.normal(0, 50, (height, width)).astype(np.float32)
+    depth[rng.random((height, width)) < 0.02] = 0
+    depth_image = np.clip(depth, 0, 65535).astype(np.uint16)
+    color_image = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return depth_image, color_image
+
+# 返回每帧平均耗时（毫秒）
+def time_analyzer(analyzer, depth_image, color_image):
+    analyzer.process(depth_image, color_image)  # 预热
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        analyzer.process(depth_image, color_image)
+    return (time.perf_counter() - start) * 1000 / REPEATS
+
+# 处理一帧期间 NumPy 临时数组的内存峰值（MB），用来近似比较内存带宽占用
+def peak_temp_memory(analyzer, depth_image, color_image):
+    tracemalloc.start()
+    analyzer.process(depth_image, color_image)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2 ** 20
+
+# 静止场景：同一深度帧叠加小幅噪声
+def static_frames(depth_image):
+    rng = np.random.default_rng(1)
+    for _ in range(REPEATS):
+        noise = rng.integers(-STATIC_NOISE, STATIC_NOISE + 1, depth_image.shape)
+        noisy = np.clip(depth_image.astype(np.int32) + noise, 0, 65535).astype(np.uint16)
+        noisy[depth_image == 0] = 0
+        yield noisy
+
+# 覆盖层阶段：回放同一串区域编号，返回每帧 CPU 时间（毫秒）和平均重绘图块比例
+def time_overlay(overlay, zone_frames, bands):
+    width = zone_frames[0].shape[1]
+    n_tiles = sum(-(-(y1 - y0) // TILE_SIZE) for y0, y1 in bands) * -(-width // TILE_SIZE)
+    for y0, y1 in bands:
+        overlay.update(y0, y1, zone_frames[0])  # 预热
+    dirty = 0
+    start = time.process_time()
+    for zones in zone_frames:
+        for y0, y1 in bands:
+            dirty += overlay.update(y0, y1, zones)
+    elapsed = (time.process_time() - start) * 1000 / len(zone_frames)
+    return elapsed, dirty / (len(zone_frames) * n_tiles)
+
+# 整帧分析的每帧 CPU 时间（毫秒），compose=False 时跳过覆盖层与合成
+def time_pipeline(analyzer, depth_frames, color_image, compose=True):
+    analyzer.process(depth_frames[0], color_image)  # 预热
+    start = time.process_time()
+    for depth in depth_frames:
+        analyzer.process(depth, color_image, compose)
+    return (time.process_time() - start) * 1000 / len(depth_frames)
+
+def scaling_benchmark():
+    cores = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, cores})
+    print(f"CPU 核心数：{cores}")
+    for width, height in FRAME_SIZES:
+        depth_image, color_image = make_frames(width, height)
+        baseline = None
+        for workers in worker_counts:
+            analyzer = BandAnalyzer(width, height, DEPTH_SCALE, workers=workers,
+                                    overlay=TileOverlay(width, height))
+            elapsed = time_analyzer(analyzer, depth_image, color_image)
+            analyzer.close()
+            baseline = baseline or elapsed
+            print(f"{width}x{height}  线程数 {workers:2d}  条带数 {len(analyzer.bands):2d}  "
+                  f"{elapsed:7.2f} ms/帧  加速比 {baseline / elapsed:4.2f}x")
+
+def path_benchmark():
+    print("整数路径与浮点路径（单线程）：")
+    for width, height in FRAME_SIZES:
+        depth_image, color_image = make_frames(width, height)
+        results = {}
+        for integer in (False, True):
+            analyzer = BandAnalyzer(width, height, DEPTH_SCALE, workers=1, integer=integer)
+            results[integer] = (time_analyzer(analyzer, depth_image, color_image),
+                                peak_temp_memory(analyzer, depth_image, color_image))
+            analyzer.close()
+        (float_ms, float_mb), (int_ms, int_mb) = results[False], results[True]
+        print(f"{width}x{height}  浮点 {float_ms:6.2f} ms/帧 {float_mb:6.2f} MB  "
+              f"整数 {int_ms:6.2f} ms/帧 {int_mb:6.2f} MB  延迟降低 {(1 - int_ms / float_ms) * 100:5.1f}%")
+
+def render_benchmark():
+    print("静止场景覆盖层（CPU 时间）：")
+    for width, height in FRAME_SIZES:
+        depth_image, color_image = make_frames(width, height)
+        depth_frames = list(static_frames(depth_image))
+
+        # 记录带回差的区域编号序列，分别回放给整段重绘和脏区域重绘
+        analyzer = BandAnalyzer(width, height, DEPTH_SCALE)
+        zone_frames = []
+        for depth in depth_frames:
+            analyzer.process(depth, color_image)
+            zone_frames.append(analyzer.zones.copy())
+        bands = analyzer.bands
+        analyzer.close()
+        full, _ = time_overlay(TileOverlay(width, height, incremental=False), zone_frames, bands)
+        partial, dirty = time_overlay(TileOverlay(width, height), zone_frames, bands)
+
+        # 整帧分析对比；传感器帧率高于 DISPLAY_FPS 时，不会被显示的帧只做分类和统计
+        totals = []
+        for incremental in (False, True):
+            analyzer = BandAnalyzer(width, height, DEPTH_SCALE, overlay=TileOverlay(width, height, incremental))
+            totals.append(time_pipeline(analyzer, depth_frames, color_image))
+            analyzer.close()
+        analyzer = BandAnalyzer(width, height, DEPTH_SCALE, overlay=TileOverlay(width, height))
+        skipped = time_pipeline(analyzer, depth_frames, color_image, compose=False)
+        analyzer.close()
+        print(f"{width}x{height}  覆盖层：整段重绘 {full:5.2f} ms/帧  脏区域重绘 {partial:5.2f} ms/帧  "
+              f"重绘图块 {dirty * 100:5.1f}%  节省 {(1 - partial / full) * 100:5.1f}%  |  "
+              f"整帧分析 {totals[0]:6.2f} -> {totals[1]:6.2f} ms/帧  不显示的帧 {skipped:6.2f} ms/帧")
+
+def main():
+    scaling_benchmark()
+    path_benchmark()
+    render_benchmark()
+
+if __name__ == "__main__":
+    main()
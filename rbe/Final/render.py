@@ -0,0 +1,201 @@
+import threading
+
+import numpy as np
+import cv2
+from analysis import LOW_PERCENTILE, NO_ZONE, ZONE_COLORS, ZONE_LUT
+
+# 常量定义
+TILE_SIZE = 32  # 覆盖层脏区域检测的图块大小（像素）
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+HINT_TEXT = "Click to view location distance.                          Press [Q] to exit."
+LEGEND_LABELS = ["<0.3m", "0.3-0.5m", "0.5-1.0m", "1.0-2.0m"]
+
+
+class Layer:
+    """预先渲染好的图层，按位置贴到画面上；expires 为到期时间（秒），None 表示常驻。"""
+
+    def __init__(self, x, y, patch, mask=None, expires=None):
+        self.x = x
+        self.y = y
+        self.patch = patch
+        self.mask = mask  # None 表示不透明
+        self.expires = expires
+
+    def draw(self, frame):
+        # 裁剪到画面范围内
+        x0, y0 = max(self.x, 0), max(self.y, 0)
+        x1 = min(self.x + self.patch.shape[1], frame.shape[1])
+        y1 = min(self.y + self.patch.shape[0], frame.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+        patch = self.patch[y0 - self.y:y1 - self.y, x0 - self.x:x1 - self.x]
+        if self.mask is None:
+            frame[y0:y1, x0:x1] = patch
+        else:
+            mask = self.mask[y0 - self.y:y1 - self.y, x0 - self.x:x1 - self.x]
+            np.copyto(frame[y0:y1, x0:x1], patch, where=mask[..., None])
+
+
+# 渲染一行文字为透明图层，(x, y) 与 cv2.putText 的起点含义相同
+def text_layer(text, x, y, expires=None, color=(255, 255, 255), scale=0.5):
+    (width, height), baseline = cv2.getTextSize(text, FONT, scale, 1)
+    patch = np.zeros((height + baseline + 2, width + 2, 3), dtype=np.uint8)
+    cv2.putText(patch, text, (1, height + 1), FONT, scale, color, 1, cv2.LINE_AA)
+    return Layer(x, y - height - 1, patch, patch.any(axis=2), expires)
+
+
+# 渲染图例：各区间颜色、面积占比，以及最近距离和低百分位距离
+def legend_layer(summary, total_pixels):
+    legend_width = 200
+    legend_height = 150
+    patch = np.full((legend_height, legend_width, 3), 255, dtype=np.uint8)
+    cv2.putText(patch, "Legend", (10, 20), FONT, 0.5, (0, 0, 0), 1, cv2.LINE_AA)
+
+    for i, color in enumerate(ZONE_COLORS):
+        cv2.rectangle(patch, (10, 40 + i * 20), (30, 60 + i * 20), color, -1)
+        cv2.putText(patch, LEGEND_LABELS[i], (40, 55 + i * 20), FONT, 0.5, (0, 0, 0), 1, cv2.LINE_AA)
+        share = 100 * summary.zone_counts[i] / total_pixels
+        cv2.putText(patch, f"{share:.1f}%", (130, 55 + i * 20), FONT, 0.5, (0, 0, 0), 1, cv2.LINE_AA)
+
+    cv2.putText(patch, f"Min {summary.closest:.2f}m  P{LOW_PERCENTILE:g} {summary.low_percentile:.2f}m", (10, 140), FONT, 0.45, (0, 0, 0), 1, cv2.LINE_AA)
+    return Layer(20, 20, patch)
+
+
+class TileOverlay:
+    """跨帧保留的区域覆盖层，按图块只重绘区域编号发生变化的部分。
+
+    由 analysis.BandAnalyzer 在各条带线程中调用 update，每个条带只读写自己的行。
+    incremental=False 时每次整段重绘，用于对比测试。
+    """
+
+    def __init__(self, width, height, incremental=True):
+        self.width = width
+        self.incremental = incremental
+        self.shown_zones = np.full((height, width), NO_ZONE, dtype=np.uint8)  # 已绘制到覆盖层的区域编号
+        self.overlay = np.zeros((height, width, 3), dtype=np.uint8)
+
+        # 按机器字比较区域编号，字宽取能同时整除画面宽度和图块宽度的最大值
+        self.word = next(n for n in (8, 4, 2, 1) if width % n == 0 and TILE_SIZE % n == 0)
+        self.word_dtype = np.dtype(f"u{self.word}")
+        self.col_starts = np.arange(0, width // self.word, TILE_SIZE // self.word)
+
+    # 更新 y0:y1 行的覆盖层，返回重绘的图块数
+    def update(self, y0, y1, zones):
+        band_zones = zones[y0:y1]
+        shown = self.shown_zones[y0:y1]
+        overlay = self.overlay[y0:y1]
+        row_starts = np.arange(0, y1 - y0, TILE_SIZE)
+        n_tiles = len(row_starts) * len(self.col_starts)
+        if not self.incremental:
+            np.copyto(shown, band_zones)
+            np.take(ZONE_LUT, band_zones, axis=0, out=overlay)
+            return n_tiles
+
+        changed = band_zones.view(self.word_dtype) != shown.view(self.word_dtype)
+        changed = np.logical_or.reduceat(changed, row_starts, axis=0)
+        changed = np.logical_or.reduceat(changed, self.col_starts, axis=1)
+        dirty = np.argwhere(changed)
+
+        # 变化的图块过多时整段重绘更快
+        if 2 * len(dirty) > n_tiles:
+            np.copyto(shown, band_zones)
+            np.take(ZONE_LUT, band_zones, axis=0, out=overlay)
+            return len(dirty)
+
+        for ty, tx in dirty:
+            rows = slice(ty * TILE_SIZE, (ty + 1) * TILE_SIZE)
+            cols = slice(tx * TILE_SIZE, (tx + 1) * TILE_SIZE)
+            np.copyto(shown[rows, cols], band_zones[rows, cols])
+            np.take(ZONE_LUT, band_zones[rows, cols], axis=0, out=overlay[rows, cols])
+        return len(dirty)
+
+
+class FrameSlot:
+    """分析线程与显示循环之间的交接区，只保留最新一帧。
+
+    锁只在复制进出时持有，显示循环的合成和 imshow 不会阻塞分析线程。
+    分析线程用 consumed 判断上一帧是否已被显示循环取走，未取走时不必合成新的显示图像。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seq = 0  # 每发布一帧加一
+        self.read_seq = 0  # 显示循环最近取走的帧序号
+        self.image = None
+        self.depth = None
+        self.summary = None
+
+    def publish(self, image, depth, summary):
+        with self.lock:
+            if self.image is None:
+                self.image, self.depth = image.copy(), depth.copy()
+            else:
+                np.copyto(self.image, image)
+                np.copyto(self.depth, depth)
+            self.summary = summary
+            self.seq += 1
+
+    # 把最新一帧复制到 out，返回其序号和区域统计摘要
+    def read(self, out):
+        with self.lock:
+            np.copyto(out, self.image)
+            self.read_seq = self.seq
+            return self.seq, self.summary
+
+    # 最新发布的一帧是否已被显示循环取走
+    def consumed(self):
+        with self.lock:
+            return self.read_seq == self.seq
+
+    # 读取一个像素的原始深度
+    def depth_at(self, x, y):
+        with self.lock:
+            return int(self.depth[y, x])
+
+
+class Renderer:
+    """显示画面的合成器：在分析线程合成好的图像上叠加界面图层。
+
+    图例和提示文字预先渲染，内容变化时才重新渲染；点击标注作为带到期时间的图层保存。
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.image = np.empty((height, width, 3), dtype=np.uint8)  # 最新一帧，由 FrameSlot.read 写入
+        self.frame = np.empty((height, width, 3), dtype=np.uint8)
+
+        self.hint = text_layer(HINT_TEXT, 20, height - 20)
+        self.legend = None
+        self.legend_key = None
+        self.labels = []  # 点击标注图层
+        self.labels_changed = False
+
+    # 添加一个定时显示的文字标注
+    def add_label(self, x, y, text, expires):
+        self.labels.append(text_layer(text, x, y, expires))
+        self.labels_changed = True
+
+    # 分析结果未更新时，是否仍需重绘（标注增加或到期）
+    def needs_redraw(self, now):
+        return self.labels_changed or any(label.expires <= now for label in self.labels)
+
+    # 图例显示的内容不变时沿用上次渲染的图层
+    def _update_legend(self, summary):
+        total_pixels = self.width * self.height
+        key = (tuple(np.round(1000 * summary.zone_counts / total_pixels).astype(int)),
+               round(summary.closest, 2), round(summary.low_percentile, 2))
+        if key != self.legend_key:
+            self.legend = legend_layer(summary, total_pixels)
+            self.legend_key = key
+
+    # 合成一帧显示画面
+    def render(self, summary, now):
+        self._update_legend(summary)
+        self.labels = [label for label in self.labels if label.expires > now]
+        self.labels_changed = False
+
+        np.copyto(self.frame, self.image)
+        for layer in [self.hint, self.legend] + self.labels:
+            layer.draw(self.frame)
+        return self.frame